@@ -15,9 +15,11 @@ Uso (ejemplos):
 from __future__ import annotations
 
 import argparse
+import functools
 import json
+import re
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
 # ----- Intento de importar dependencias reales -----
 HAS_DEPS = True
@@ -34,6 +36,9 @@ except Exception:
 LEVEL_NUM_TO_LABEL: Dict[int, str] = {1: "A1", 2: "A2", 3: "B1", 4: "B2", 5: "C1", 6: "C2"}
 LEVEL_LABEL_TO_NUM: Dict[str, int] = {v: k for k, v in LEVEL_NUM_TO_LABEL.items()}
 
+# ----- Componentes de spaCy innecesarios para la clasificación -----
+SPACY_DISABLED_PIPES: List[str] = ["parser", "ner"]
+
 # ----- Abreviaciones comunes para análisis con spaCy -----
 ABBREVIATION_MAP: Dict[str, str] = {
     "'m": "am",
@@ -45,6 +50,9 @@ ABBREVIATION_MAP: Dict[str, str] = {
     "'d": "would",
 }
 
+# ----- Tokenización simple (respaldo heurístico) -----
+_TOKEN_RE = re.compile(r"([\w']+|[^\w\s])")
+
 @dataclass
 class TokenCEFR:
     text: str
@@ -60,17 +68,41 @@ class TokenCEFR:
 
 # ==================== Núcleo de Clasificación ====================
 
+@functools.lru_cache(maxsize=1)
 def _load_nlp():
-    """Carga el pipeline de spaCy si está disponible."""
+    """Carga el pipeline de spaCy si está disponible (una sola vez por proceso)."""
     if not HAS_DEPS:
         return None
     try:
-        return spacy.load("en_core_web_sm")  # type: ignore
+        # Solo se consumen token.text y token.pos_: el parser y NER no aportan y son
+        # los componentes más caros. attribute_ruler se mantiene porque es el que
+        # asigna pos_ a partir de las etiquetas del tagger.
+        return spacy.load("en_core_web_sm", disable=SPACY_DISABLED_PIPES)  # type: ignore
     except Exception:
         # Modelo no instalado
         return None
 
 
+@functools.lru_cache(maxsize=1)
+def _get_word_analyzer():
+    """Devuelve el CEFRAnalyzer compartido (su construcción es costosa)."""
+    return CEFRAnalyzer()  # type: ignore
+
+
+@functools.lru_cache(maxsize=1)
+def _get_spacy_analyzer():
+    """Devuelve el CEFRSpaCyAnalyzer compartido, construido sobre el analizador de palabras."""
+    return CEFRSpaCyAnalyzer(
+        _get_word_analyzer(), abbreviation_mapping=ABBREVIATION_MAP
+    )  # type: ignore
+
+
+@functools.lru_cache(maxsize=200_000)
+def _cached_word_level(word: str):
+    """Nivel cefrpy de una palabra, memorizado (las palabras se repiten mucho)."""
+    return _get_word_analyzer().get_average_word_level_CEFR(word)
+
+
 def classify_word(word: str) -> Tuple[str, Dict[str, object]]:
     """Clasifica una palabra en su nivel CEFR.
 
@@ -82,8 +114,7 @@ def classify_word(word: str) -> Tuple[str, Dict[str, object]]:
 
     if HAS_DEPS:
         try:
-            analyzer = CEFRAnalyzer()  # type: ignore
-            lvl = analyzer.get_average_word_level_CEFR(word_clean)
+            lvl = _cached_word_level(word_clean)
             # cefrpy puede devolver None o número 1..6
             if isinstance(lvl, (int, float)):
                 # redondear por si viene float
@@ -125,10 +156,7 @@ def classify_text(text: str) -> Tuple[str, Dict[str, object]]:
         nlp = _load_nlp()
         if nlp is not None:
             try:
-                cefr_word_analyzer = CEFRAnalyzer()  # type: ignore
-                analyzer = CEFRSpaCyAnalyzer(
-                    cefr_word_analyzer, abbreviation_mapping=ABBREVIATION_MAP
-                )  # type: ignore
+                analyzer = _get_spacy_analyzer()
                 doc = nlp(txt)
                 analized = analyzer.analize_doc(doc)  # returns token details aligned to doc
 
@@ -180,9 +208,9 @@ def classify_text(text: str) -> Tuple[str, Dict[str, object]]:
 
 # ==================== Heurísticas de respaldo ====================
 
-def _heuristic_word_level(word: str) -> str:
-    w = word.lower()
-    a1 = {
+# ----- Vocabulario básico para la heurística de respaldo -----
+_A1_WORDS: FrozenSet[str] = frozenset(
+    {
         "the",
         "a",
         "an",
@@ -222,7 +250,10 @@ def _heuristic_word_level(word: str) -> str:
         "work",
         "school",
     }
-    a2 = {
+)
+
+_A2_WORDS: FrozenSet[str] = frozenset(
+    {
         "about",
         "after",
         "again",
@@ -239,44 +270,67 @@ def _heuristic_word_level(word: str) -> str:
         "write",
         "world",
     }
-    if w in a1:
-        return "A1"
-    if w in a2:
-        return "A2"
+)
+
+
+# Vocabulario básico unificado: una sola búsqueda por palabra (A1 prevalece sobre A2)
+_BASIC_WORD_NUM: Dict[str, int] = {
+    **dict.fromkeys(_A2_WORDS, 2),
+    **dict.fromkeys(_A1_WORDS, 1),
+}
+
+# Nivel máximo que puede asignar la heurística (C1): permite cortar el recorrido.
+_HEURISTIC_MAX_NUM = 5
+
+
+def _heuristic_word_num(word: str) -> int:
+    """Nivel heurístico de una palabra como número 1..5 (sin pasar por etiquetas)."""
+    w = word.lower()
+    lvl = _BASIC_WORD_NUM.get(w)
+    if lvl is not None:
+        return lvl
     L = len(w)
     if L <= 4:
-        return "A1"
+        return 1
     if L <= 6:
-        return "A2"
+        return 2
     if L <= 8:
-        return "B1"
+        return 3
     if L <= 10:
-        return "B2"
-    return "C1"
+        return 4
+    return _HEURISTIC_MAX_NUM
+
+
+def _heuristic_word_level(word: str) -> str:
+    return LEVEL_NUM_TO_LABEL[_heuristic_word_num(word)]
 
 
 def _heuristic_text_level(text: str) -> str:
-    words = [x for x in _simple_tokenize(text) if x.isalpha()]
-    if not words:
-        return "UNKNOWN"
     # nivel global = máximo de niveles heurísticos por palabra
-    levels = [LEVEL_LABEL_TO_NUM.get(_heuristic_word_level(w), 1) for w in words]
-    num = max(levels) if levels else 1
-    return LEVEL_NUM_TO_LABEL.get(num, "A1")
+    # (cada palabra distinta se evalúa una sola vez)
+    num = 0
+    for w in {t for t in _simple_tokenize(text) if t.isalpha()}:
+        lvl = _heuristic_word_num(w)
+        if lvl > num:
+            num = lvl
+            if num == _HEURISTIC_MAX_NUM:
+                break
+    if num == 0:
+        return "UNKNOWN"
+    return LEVEL_NUM_TO_LABEL[num]
 
 
 def _simple_tokenize(text: str) -> List[str]:
     # Tokenización simple por espacios y signos comunes
-    import re
-
-    return [t for t in re.split(r"([\w']+|[^\w\s])", text) if t and not t.isspace()]
+    # (findall devuelve directamente los tokens, sin los separadores de split)
+    return _TOKEN_RE.findall(text)
 
 
 def _heuristic_tokenize_and_level(text: str) -> List[TokenCEFR]:
     tokens: List[TokenCEFR] = []
     for t in _simple_tokenize(text):
         if t.isalpha():
-            lvl = LEVEL_LABEL_TO_NUM.get(_heuristic_word_level(t))
+            lvl = _heuristic_word_num(t)
         else:
             lvl = None
         tokens.append(TokenCEFR(text=t, pos=None, level_num=lvl))
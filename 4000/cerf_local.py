@@ -12,11 +12,16 @@ Uso:
     python cerf_local.py
 """
 
+import functools
 import json
+import math
 import torch
 import os
 import sys
 import argparse
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Verificar dependencias
@@ -33,11 +38,26 @@ except ImportError as e:
     HAS_DEPS = False
     sys.exit(1)
 
+# Mensajes de análisis detallado (por palabra/frase). Desactivar con CEFR_VERBOSE=0
+# o --quiet al procesar archivos grandes: evita miles de escrituras en stdout.
+VERBOSE = os.environ.get("CEFR_VERBOSE", "1").strip().lower() not in ("0", "false", "no")
+
+def _debug(*args, **kwargs):
+    """print() que solo escribe en modo detallado (VERBOSE)"""
+    if VERBOSE:
+        print(*args, **kwargs)
+
+# Mapeos de niveles CEFR
+LEVEL_TO_NUM = {"A1": 1, "A2": 2, "B1": 3, "B2": 4, "C1": 5, "C2": 6}
+NUM_TO_LEVEL = {num: level for level, num in LEVEL_TO_NUM.items()}
+
 # Cargar modelo de spaCy
 def load_spacy_model():
     """Carga el modelo de spaCy"""
     try:
-        nlp = spacy.load("en_core_web_sm")
+        # Parser y NER no se usan (solo texto, pos_ y is_punct); desactivarlos
+        # evita sus pasadas por cada frase. attribute_ruler se conserva para pos_.
+        nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
         print("✅ Modelo spaCy cargado correctamente")
         return nlp
     except OSError:
@@ -50,9 +70,61 @@ nlp = load_spacy_model()
 if nlp is None:
     print("⚠️  Continuando sin spaCy...")
 
+@functools.lru_cache(maxsize=1)
+def _get_word_analyzer():
+    """Devuelve el CEFRAnalyzer compartido (se construye una sola vez por proceso)"""
+    return CEFRAnalyzer()
+
+@functools.lru_cache(maxsize=1)
+def _get_spacy_analyzer():
+    """Devuelve el CEFRSpaCyAnalyzer compartido"""
+    return CEFRSpaCyAnalyzer(_get_word_analyzer())
+
+@functools.lru_cache(maxsize=200_000)
+def _lookup_word_level(palabra):
+    """
+    Nivel promedio cefrpy de una palabra (enum CEFRLevel o None), memorizado:
+    en un TSV las mismas palabras se repiten muchas veces.
+    """
+    return _get_word_analyzer().get_average_word_level_CEFR(palabra)
+
+# Tamaño de lote para nlp.pipe al procesar archivos TSV
+SPACY_BATCH_SIZE = int(os.environ.get("CEFR_SPACY_BATCH_SIZE", "64"))
+
+# Tamaño de lote para el clasificador neural (predict_batch)
+MODEL_BATCH_SIZE = int(os.environ.get("CEFR_MODEL_BATCH_SIZE", "32"))
+
+# Entradas del TSV que se acumulan antes de clasificarlas en lote y escribirlas
+TSV_BLOCK_SIZE = int(os.environ.get("CEFR_TSV_BLOCK_SIZE", "256"))
+
+# Procesos para clasificar el TSV en paralelo (0 = todos los núcleos)
+TSV_WORKERS = int(os.environ.get("CEFR_TSV_WORKERS", "1"))
+
+# Precisión del clasificador neural: fp32 (por defecto) | auto | bf16 | fp16 | int8
+# Las precisiones reducidas pueden cambiar la pista gramatical en casos ajustados.
+MODEL_PRECISION = os.environ.get("CEFR_PRECISION", "fp32").strip().lower()
+
+# Compilar el clasificador con torch.compile (arranque más lento, inferencia más rápida)
+USE_TORCH_COMPILE = os.environ.get("CEFR_TORCH_COMPILE", "0").strip().lower() in ("1", "true", "yes")
+# Con el modelo compilado, las longitudes de lote se redondean a múltiplos de este
+# valor para que solo haya unas pocas formas distintas que compilar
+COMPILE_PAD_MULTIPLE = 16
+
 # Buscar modelo local
 def find_model_path():
-    """Busca el modelo en rutas posibles"""
+    """
+    Busca el modelo en rutas posibles.
+    Si la variable de entorno CEFR_MODEL_PATH está definida se usa directamente;
+    si no es un directorio válido se buscan las rutas habituales.
+    """
+    env_path = os.environ.get("CEFR_MODEL_PATH")
+    if env_path:
+        if os.path.isdir(env_path):
+            print(f"✅ Modelo (CEFR_MODEL_PATH): {env_path}")
+            return env_path
+        print(f"⚠️  CEFR_MODEL_PATH no es un directorio válido: {env_path}")
+        print("🔎 Buscando el modelo en las rutas habituales...")
+    
     possible_paths = [
         "./cefr_classifier_model_final",
         "../cefr_classifier_model_final", 
@@ -73,124 +145,166 @@ def clasificar_palabra(palabra: str):
     """
     Clasifica una palabra individual en su nivel CEFR.
     """
-    print(f"🔍 Análisis de la palabra: '{palabra}'")
+    _debug(f"🔍 Análisis de la palabra: '{palabra}'")
     
     if not HAS_DEPS:
         return get_heuristic_level(palabra)
     
     try:
-        analyzer = CEFRAnalyzer()
-        nivel_promedio = analyzer.get_average_word_level_CEFR(palabra)
+        nivel_promedio = _lookup_word_level(palabra)
 
         if nivel_promedio:
             # El resultado es un enum CEFRLevel, acceder al nombre directamente
             nivel_cefr = nivel_promedio.name
             nivel_numerico = nivel_promedio.value
             
-            print(f"✅ Nivel CEFR: {nivel_cefr} (puntuación: {nivel_numerico})")
-            print("-" * 40)
+            _debug(f"✅ Nivel CEFR: {nivel_cefr} (puntuación: {nivel_numerico})")
+            _debug("-" * 40)
             return nivel_cefr
         else:
-            print("⚠️  Palabra no encontrada en la base de datos cefrpy")
+            _debug("⚠️  Palabra no encontrada en la base de datos cefrpy")
             heuristic_level = get_heuristic_level(palabra)
-            print(f"📏 Nivel heurístico: {heuristic_level}")
-            print("-" * 40)
+            _debug(f"📏 Nivel heurístico: {heuristic_level}")
+            _debug("-" * 40)
             return heuristic_level
     except Exception as e:
         print(f"❌ Error en análisis: {e}")
         return get_heuristic_level(palabra)
 
-def get_heuristic_level(word):
-    """Nivel CEFR heurístico basado en longitud y frecuencia"""
+# Palabras muy básicas A1 (heurística)
+A1_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'i', 'you', 'he', 'she', 'it', 'we', 'they',
+    'good', 'bad', 'big', 'small', 'new', 'old', 'hot', 'cold', 'go', 'come',
+    'eat', 'drink', 'see', 'look', 'like', 'want', 'need', 'home', 'time', 'day'
+})
+
+# Palabras básicas A2
+A2_WORDS = frozenset({
+    'about', 'after', 'again', 'because', 'different', 'important', 'often',
+    'through', 'young', 'large', 'write', 'world', 'work', 'family', 'friend'
+})
+
+# Vocabulario básico unificado: una sola búsqueda por palabra (A1 prevalece sobre A2)
+BASIC_WORD_NUMS = {**dict.fromkeys(A2_WORDS, 2), **dict.fromkeys(A1_WORDS, 1)}
+
+# Nivel máximo que puede asignar la heurística (C1): permite cortar el recorrido
+HEURISTIC_MAX_NUM = 5
+
+def get_heuristic_level_num(word):
+    """Nivel CEFR heurístico como número 1..5 (sin pasar por etiquetas)"""
     word = word.lower().strip()
     
-    # Palabras muy básicas A1
-    a1_words = {
-        'the', 'a', 'an', 'and', 'i', 'you', 'he', 'she', 'it', 'we', 'they',
-        'good', 'bad', 'big', 'small', 'new', 'old', 'hot', 'cold', 'go', 'come',
-        'eat', 'drink', 'see', 'look', 'like', 'want', 'need', 'home', 'time', 'day'
-    }
-    
-    # Palabras básicas A2
-    a2_words = {
-        'about', 'after', 'again', 'because', 'different', 'important', 'often',
-        'through', 'young', 'large', 'write', 'world', 'work', 'family', 'friend'
-    }
-    
-    if word in a1_words:
-        return 'A1'
-    elif word in a2_words:
-        return 'A2'
+    nivel = BASIC_WORD_NUMS.get(word)
+    if nivel is not None:
+        return nivel
+    
+    # Usar longitud como heurística
+    length = len(word)
+    if length <= 4:
+        return 1
+    elif length <= 6:
+        return 2
+    elif length <= 8:
+        return 3
+    elif length <= 10:
+        return 4
     else:
-        # Usar longitud como heurística
-        length = len(word)
-        if length <= 4:
-            return 'A1'
-        elif length <= 6:
-            return 'A2'
-        elif length <= 8:
-            return 'B1'
-        elif length <= 10:
-            return 'B2'
-        else:
-            return 'C1'
+        return HEURISTIC_MAX_NUM
+
+def get_heuristic_level(word):
+    """Nivel CEFR heurístico basado en longitud y frecuencia"""
+    return NUM_TO_LEVEL[get_heuristic_level_num(word)]
+
+def get_heuristic_text_level_num(texto):
+    """
+    Máximo nivel heurístico (1..5) de las palabras alfabéticas de `texto`,
+    en una sola pasada y cortando al llegar a C1. Devuelve 0 si no hay palabras.
+    """
+    maximo = 0
+    for word in texto.split():
+        if not word.isalpha():
+            continue
+        nivel = get_heuristic_level_num(word)
+        if nivel > maximo:
+            maximo = nivel
+            if maximo == HEURISTIC_MAX_NUM:
+                break
+    return maximo
 
 
-def clasificar_frase_con_anclaje_dominante(frase: str, classifier):
+# Pesos (léxico, gramática) de la ponderación condicional
+PESOS_DOMINANCIA_LEXICA = (0.85, 0.15)
+PESOS_DOMINANCIA_GRAMATICAL = (0.25, 0.75)
+
+def combinar_niveles(lexical_anchor_num, grammatical_hint_num):
+    """
+    Combina el ancla léxica y la pista gramatical (niveles numéricos 1..6).
+    Domina la que tenga el nivel más alto (en empate, la léxica).
+    Devuelve (puntaje_final, nivel_numérico_más_cercano, pesos) donde `pesos` es
+    PESOS_DOMINANCIA_LEXICA o PESOS_DOMINANCIA_GRAMATICAL.
+    """
+    if lexical_anchor_num >= grammatical_hint_num:
+        pesos = PESOS_DOMINANCIA_LEXICA
+    else:
+        pesos = PESOS_DOMINANCIA_GRAMATICAL
+    lexical_weight, grammatical_weight = pesos
+
+    final_score = (lexical_anchor_num * lexical_weight) + (grammatical_hint_num * grammatical_weight)
+    # Nivel más cercano al puntaje (en empate gana el nivel inferior)
+    closest_num = max(1, min(6, math.ceil(final_score - 0.5)))
+    return final_score, closest_num, pesos
+
+def clasificar_frase_con_anclaje_dominante(frase: str, classifier, doc=None, grammatical_probs=None):
     """
     Clasifica una frase utilizando la lógica de "Ancla Dominante".
     La dominancia (léxica o gramatical) se determina por el nivel más alto.
+    Si se recibe `doc` (ya procesado con spaCy, p. ej. vía nlp.pipe) se reutiliza,
+    y lo mismo con `grammatical_probs` (array de predict_raw / predict_batch_raw).
     """
-    print(f"🔍 Análisis con Anclaje Dominante: '{frase}'")
-
-    LEVEL_TO_NUM = {"A1": 1, "A2": 2, "B1": 3, "B2": 4, "C1": 5, "C2": 6}
-    NUM_TO_LEVEL = {num: level for level, num in LEVEL_TO_NUM.items()}
+    _debug(f"🔍 Análisis con Anclaje Dominante: '{frase}'")
 
     # --- 1. Análisis Léxico para encontrar la palabra de MÁS alto nivel ---
     lexical_anchor_num = 0
-    palabras_analizadas = []
     
     if HAS_DEPS and nlp:
         try:
-            cefr_word_analyzer = CEFRAnalyzer()
-            analyzer = CEFRSpaCyAnalyzer(cefr_word_analyzer)
-            doc = nlp(frase)
+            analyzer = _get_spacy_analyzer()
+            if doc is None:
+                doc = nlp(frase)
             resultado_analisis = analyzer.analize_doc(doc)
 
-            print("\n📚 Análisis léxico por palabra:")
-            for token, token_info in zip(doc, resultado_analisis):
-                if token.is_punct or token.is_space:
-                    continue
-                    
-                palabra = token_info[0]
-                nivel_numerico = token_info[3]  # Esto es un float
-                
-                if nivel_numerico is not None and nivel_numerico > 0:
-                    if nivel_numerico > lexical_anchor_num:
-                        lexical_anchor_num = nivel_numerico
-                    nivel_cefr = NUM_TO_LEVEL.get(round(nivel_numerico), f"N{nivel_numerico}")
-                    palabras_analizadas.append((palabra, nivel_cefr))
-                    print(f"  {palabra:<15} → {nivel_cefr}")
-                else:
-                    print(f"  {palabra:<15} → No encontrada")
+            # (palabra, nivel numérico float o None) de cada token que no es puntuación
+            palabras_analizadas = [
+                (token_info[0], token_info[3])
+                for token, token_info in zip(doc, resultado_analisis)
+                if not (token.is_punct or token.is_space)
+            ]
+            lexical_anchor_num = max(
+                (nivel for _, nivel in palabras_analizadas if nivel is not None and nivel > 0),
+                default=0,
+            )
+
+            if VERBOSE:
+                print("\n📚 Análisis léxico por palabra:")
+                for palabra, nivel_numerico in palabras_analizadas:
+                    if nivel_numerico is not None and nivel_numerico > 0:
+                        nivel_cefr = NUM_TO_LEVEL.get(round(nivel_numerico), f"N{nivel_numerico}")
+                        print(f"  {palabra:<15} → {nivel_cefr}")
+                    else:
+                        print(f"  {palabra:<15} → No encontrada")
         except Exception as e:
             print(f"⚠️  Error en análisis léxico: {e}")
     
     if lexical_anchor_num == 0:
-        print("⚠️  No se encontraron palabras con nivel CEFR, usando heurística")
+        _debug("⚠️  No se encontraron palabras con nivel CEFR, usando heurística")
         # Usar análisis heurístico para toda la frase
-        words = [w for w in frase.split() if w.isalpha()]
-        if words:
-            heuristic_levels = [LEVEL_TO_NUM.get(get_heuristic_level(word), 1) for word in words]
-            lexical_anchor_num = max(heuristic_levels) if heuristic_levels else 1
-        else:
-            lexical_anchor_num = 1
+        lexical_anchor_num = get_heuristic_text_level_num(frase) or 1
         lexical_anchor_tag = NUM_TO_LEVEL.get(round(lexical_anchor_num), "A1")
     else:
         # lexical_anchor_num ya es un número directo
         lexical_anchor_tag = NUM_TO_LEVEL.get(round(lexical_anchor_num), "A1")
 
-    print(f"\n📈 Ancla Léxica Dominante: {lexical_anchor_tag} ({lexical_anchor_num:.2f})")
+    _debug(f"\n📈 Ancla Léxica Dominante: {lexical_anchor_tag} ({lexical_anchor_num:.2f})")
 
     # --- 2. Obtener la "Pista Gramatical" usando el clasificador ---
     grammatical_hint_num = 1
@@ -198,37 +312,33 @@ def clasificar_frase_con_anclaje_dominante(frase: str, classifier):
     
     if classifier:
         try:
-            grammatical_scores = json.loads(classifier.predict(frase))
-            top_grammatical_level_tag = max(grammatical_scores, key=grammatical_scores.get)
+            if grammatical_probs is None:
+                labels, grammatical_probs = classifier.predict_raw(frase)
+            else:
+                labels = classifier.labels
+            idx = int(grammatical_probs.argmax())
+            top_grammatical_level_tag = labels[idx]
             grammatical_hint_num = LEVEL_TO_NUM.get(top_grammatical_level_tag, 1)
-            confidence = grammatical_scores[top_grammatical_level_tag]
-            print(f"🤖 Análisis Gramatical: {top_grammatical_level_tag} (confianza: {confidence:.3f})")
+            confidence = float(grammatical_probs[idx])
+            _debug(f"🤖 Análisis Gramatical: {top_grammatical_level_tag} (confianza: {confidence:.3f})")
         except Exception as e:
             print(f"⚠️  Error en análisis gramatical: {e}")
-            print(f"🤖 Análisis Gramatical: {top_grammatical_level_tag} (fallback)")
+            _debug(f"🤖 Análisis Gramatical: {top_grammatical_level_tag} (fallback)")
     else:
-        print(f"🤖 Análisis Gramatical: {top_grammatical_level_tag} (clasificador no disponible)")
+        _debug(f"🤖 Análisis Gramatical: {top_grammatical_level_tag} (clasificador no disponible)")
 
     # --- 3. Combinar con Ponderación Condicional ---
-    if lexical_anchor_num >= grammatical_hint_num:
-        lexical_weight = 0.85
-        grammatical_weight = 0.15
-        dominance = "📚 Léxico"
-    else:
-        lexical_weight = 0.25
-        grammatical_weight = 0.75
-        dominance = "🤖 Gramática"
-
-    final_score = (lexical_anchor_num * lexical_weight) + (grammatical_hint_num * grammatical_weight)
-    closest_level = min(LEVEL_TO_NUM, key=lambda level: abs(LEVEL_TO_NUM[level] - final_score))
-    final_level_tag = closest_level
-
-    print(f"\n🎯 Dominancia: {dominance}")
-    print(f"⚖️  Pesos → Léxico: {lexical_weight:.0%}, Gramática: {grammatical_weight:.0%}")
-    print("-" * 50)
-    print(f"✅ NIVEL FINAL: {final_level_tag}")
-    print(f"📊 Puntaje final: {final_score:.2f}")
-    print("-" * 50)
+    final_score, closest_num, pesos = combinar_niveles(lexical_anchor_num, grammatical_hint_num)
+    final_level_tag = NUM_TO_LEVEL[closest_num]
+
+    if VERBOSE:
+        dominance = "📚 Léxico" if pesos is PESOS_DOMINANCIA_LEXICA else "🤖 Gramática"
+        print(f"\n🎯 Dominancia: {dominance}")
+        print(f"⚖️  Pesos → Léxico: {pesos[0]:.0%}, Gramática: {pesos[1]:.0%}")
+    _debug("-" * 50)
+    _debug(f"✅ NIVEL FINAL: {final_level_tag}")
+    _debug(f"📊 Puntaje final: {final_score:.2f}")
+    _debug("-" * 50)
 
     return final_level_tag
 
@@ -250,41 +360,196 @@ class CEFRClassifier:
         
         try:
             print(f"📂 Cargando modelo desde: {model_path}")
-            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+            # Modelo local: tokenizador rápido (Rust) y sin consultas al Hub
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                model_path, use_fast=True, local_files_only=True
+            )
+            self.model = AutoModelForSequenceClassification.from_pretrained(
+                model_path, local_files_only=True
+            )
             self.model.to(self.device)
             self.model.eval()
-            print(f"✅ Clasificador cargado en: {self.device}")
+            # Etiquetas ordenadas por índice de clase (alineadas con las probabilidades)
+            id2label = self.model.config.id2label
+            self.labels = tuple(id2label[i] for i in range(len(id2label)))
+            # Misma tokenización para predict_raw y predict_batch_raw: truncar a la
+            # longitud máxima del modelo (como hacía predict originalmente)
+            max_length = self.tokenizer.model_max_length
+            if not max_length or max_length > 100_000:
+                # Tokenizador sin longitud máxima configurada (valor centinela)
+                max_length = getattr(self.model.config, "max_position_embeddings", 512)
+            self.max_length = max_length
+            self.tokenizer_kwargs = {
+                "return_tensors": "pt",
+                "padding": True,
+                "truncation": True,
+                "max_length": self.max_length,
+            }
+            self.precision = self._aplicar_precision(MODEL_PRECISION)
+            # Modelo sin compilar, conservado mientras se usa la versión compilada
+            self._modelo_eager = None
+            if USE_TORCH_COMPILE:
+                self._compilar_modelo()
+            print(f"✅ Clasificador cargado en: {self.device} ({self.precision})")
         except Exception as e:
             print(f"❌ Error cargando modelo: {e}")
             raise
 
-    def predict(self, sentence: str) -> str:
+    def _aplicar_precision(self, precision):
         """
-        Predice las probabilidades del nivel CEFR para una oración y devuelve un JSON.
+        Ajusta la precisión numérica del modelo y devuelve la precisión aplicada.
+        'auto' usa bf16 (o fp16) en GPU e int8 dinámico en CPU.
         """
-        # Tokenizar la oración de entrada
-        inputs = self.tokenizer(sentence, return_tensors="pt", padding=True, truncation=True)
+        if precision == "auto":
+            if self.device.type == "cuda":
+                precision = "bf16" if torch.cuda.is_bf16_supported() else "fp16"
+            else:
+                precision = "int8"
+
+        try:
+            if precision in ("bf16", "fp16"):
+                if self.device.type != "cuda":
+                    print(f"⚠️  Precisión {precision} solo se aplica en GPU, usando fp32")
+                    return "fp32"
+                dtype = torch.bfloat16 if precision == "bf16" else torch.float16
+                self.model = self.model.to(dtype=dtype)
+            elif precision == "int8":
+                if self.device.type != "cpu":
+                    print("⚠️  Cuantización int8 solo se aplica en CPU, usando fp32")
+                    return "fp32"
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            elif precision != "fp32":
+                print(f"⚠️  Precisión desconocida '{precision}', usando fp32")
+                return "fp32"
+        except Exception as e:
+            print(f"⚠️  No se pudo aplicar precisión {precision}: {e}")
+            return "fp32"
+
+        return precision
+
+    def _compilar_modelo(self):
+        """
+        Compila el forward del modelo con torch.compile (PyTorch 2.x) y lo calienta.
+        Si la compilación falla se sigue con el modelo original (eager).
+        """
+        if not hasattr(torch, "compile"):
+            print("⚠️  torch.compile no disponible (requiere PyTorch 2.x)")
+            return
+
+        modelo_eager = self.model
+        try:
+            print("⚙️  Compilando modelo con torch.compile...")
+            self.model = torch.compile(modelo_eager, mode="reduce-overhead",
+                                       fullgraph=False, dynamic=True)
+            self._modelo_eager = modelo_eager
+            # Relleno dinámico por tramos: cada lote se rellena hasta el siguiente
+            # múltiplo de COMPILE_PAD_MULTIPLE, no hasta max_length, para no pagar
+            # 512 posiciones por frases cortas y limitar las formas distintas
+            self.tokenizer_kwargs["pad_to_multiple_of"] = COMPILE_PAD_MULTIPLE
+            # La compilación real ocurre en la primera llamada: calentar con las
+            # formas de uso, un lote del TSV (MODEL_BATCH_SIZE) y una sola frase
+            self._probabilidades(self._tokenizar(["warmup"] * MODEL_BATCH_SIZE))
+            self._probabilidades(self._tokenizar("warmup"))
+        except Exception as e:
+            print(f"⚠️  No se pudo compilar el modelo: {e}")
+            self._usar_modelo_eager()
+
+    def _usar_modelo_eager(self):
+        """Descarta el modelo compilado y vuelve al original con relleno dinámico."""
+        if self._modelo_eager is not None:
+            self.model = self._modelo_eager
+            self._modelo_eager = None
+        self.tokenizer_kwargs.pop("pad_to_multiple_of", None)
+
+    def _probabilidades(self, inputs):
+        """Pasada del modelo: devuelve un array NumPy (n_oraciones, n_clases) en float32."""
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
-        # Realizar la inferencia sin calcular gradientes para mayor eficiencia
-        with torch.no_grad():
-            outputs = self.model(**inputs)
+        # Realizar la inferencia en modo inferencia (sin autograd ni contadores de versión)
+        with torch.inference_mode():
+            try:
+                outputs = self.model(**inputs)
+            except Exception as e:
+                if self._modelo_eager is None:
+                    raise
+                # Fallo del modelo compilado en ejecución: seguir con el original
+                print(f"⚠️  Error en el modelo compilado, usando modo eager: {e}")
+                self._usar_modelo_eager()
+                outputs = self.model(**inputs)
+
+            # Los 'logits' son las puntuaciones brutas del modelo para cada clase
+            logits = outputs.logits
+
+            # Aplicar la función softmax para convertir los logits en una distribución de probabilidad
+            probabilities = torch.nn.functional.softmax(logits, dim=-1)
+
+        return probabilities.float().cpu().numpy()
+
+    def _tokenizar(self, sentences):
+        """Tokeniza una oración o lista de oraciones con los parámetros compartidos."""
+        return self.tokenizer(sentences, **self.tokenizer_kwargs)
+
+    def predict_raw(self, sentence: str):
+        """
+        Predice las probabilidades del nivel CEFR para una oración.
+        Devuelve (labels, probs) con probs como array NumPy alineado con labels.
+        """
+        # Tokenizar la oración de entrada
+        inputs = self._tokenizar(sentence)
+        return self.labels, self._probabilidades(inputs)[0]
 
-        # Los 'logits' son las puntuaciones brutas del modelo para cada clase
-        logits = outputs.logits
+    def predict_batch_raw(self, sentences):
+        """
+        Igual que predict_raw para una lista de oraciones, con una sola pasada del
+        modelo. Devuelve (labels, probs) con probs de forma (n_oraciones, n_clases).
+        """
+        inputs = self._tokenizar(list(sentences))
+        return self.labels, self._probabilidades(inputs)
 
-        # Aplicar la función softmax para convertir los logits en una distribución de probabilidad
-        probabilities = torch.nn.functional.softmax(logits, dim=-1).squeeze()
+    def predict(self, sentence: str) -> dict:
+        """
+        Predice las probabilidades del nivel CEFR para una oración y devuelve un
+        diccionario {nivel: probabilidad}.
+        """
+        labels, probs = self.predict_raw(sentence)
 
         # Crear el diccionario de salida con las probabilidades para cada nivel
-        prob_dict = {
-            self.model.config.id2label[i]: prob.item()
-            for i, prob in enumerate(probabilities)
-        }
+        return dict(zip(labels, probs.tolist()))
+
+    def predict_json(self, sentence: str) -> str:
+        """
+        Igual que predict, pero devuelve el resultado como una cadena JSON formateada.
+        """
+        return json.dumps(self.predict(sentence), indent=4)
 
-        # Devolver el resultado como una cadena JSON formateada
-        return json.dumps(prob_dict, indent=4)
+    def predict_batch(self, sentences):
+        """
+        Predice las probabilidades del nivel CEFR para una lista de oraciones
+        con una sola pasada del modelo. Devuelve una lista de diccionarios.
+        """
+        if not sentences:
+            return []
+
+        labels, probs = self.predict_batch_raw(sentences)
+        return [dict(zip(labels, fila)) for fila in probs.tolist()]
+
+def predecir_por_lotes(frases, batch_size=None):
+    """
+    Genera las probabilidades gramaticales (array NumPy por frase, alineado con
+    classifier.labels) usando predict_batch_raw.
+    Si un lote falla se devuelve None para sus frases (se usará predict_raw individual).
+    """
+    batch_size = batch_size or MODEL_BATCH_SIZE
+    for inicio in range(0, len(frases), batch_size):
+        lote = frases[inicio:inicio + batch_size]
+        try:
+            _, probs = classifier.predict_batch_raw(lote)
+            yield from probs
+        except Exception as e:
+            print(f"⚠️  Error en predicción por lotes: {e}")
+            yield from [None] * len(lote)
 
 # Inicializar el clasificador
 classifier = None
@@ -305,45 +570,208 @@ else:
 # ==============================================================================
 # FUNCIONES PRINCIPALES
 # ==============================================================================
-def obtener_nivel_mcerr(texto):
+def obtener_nivel_mcerr(texto, doc=None, grammatical_probs=None):
     """
     Clasifica una frase utilizando la lógica de "Ancla Dominante".
     """
     if classifier is None:
-        print("⚠️  Clasificador neural no disponible, usando solo análisis léxico")
+        _debug("⚠️  Clasificador neural no disponible, usando solo análisis léxico")
         # Fallback a análisis léxico simple
         if HAS_DEPS and nlp:
-            return clasificar_frase_con_anclaje_dominante(texto, None)
+            return clasificar_frase_con_anclaje_dominante(texto, None, doc)
         else:
             # Análisis heurístico para frases
-            words = [w for w in texto.split() if w.isalpha()]
-            if words:
-                levels = [get_heuristic_level(word) for word in words]
-                LEVEL_TO_NUM = {"A1": 1, "A2": 2, "B1": 3, "B2": 4, "C1": 5, "C2": 6}
-                level_nums = [LEVEL_TO_NUM.get(level, 1) for level in levels]
-                max_level = max(level_nums)
-                NUM_TO_LEVEL = {v: k for k, v in LEVEL_TO_NUM.items()}
-                return NUM_TO_LEVEL.get(max_level, 'A1')
-            return 'A1'
-    
-    return clasificar_frase_con_anclaje_dominante(texto, classifier)
-
-def clasificar_texto_auto(texto):
+            return NUM_TO_LEVEL[get_heuristic_text_level_num(texto) or 1]
+    
+    return clasificar_frase_con_anclaje_dominante(texto, classifier, doc, grammatical_probs)
+
+def clasificar_texto_auto(texto, doc=None, grammatical_probs=None):
     """
     Clasifica el texto como palabra o frase y llama a la función apropiada.
+    `doc` y `grammatical_probs` son el análisis spaCy y las probabilidades del
+    clasificador ya calculados para la frase (opcionales).
     """
     texto = texto.strip()
     
     if " " in texto:
-        print("📖 Detectado como frase")
-        return obtener_nivel_mcerr(texto)
+        _debug("📖 Detectado como frase")
+        return obtener_nivel_mcerr(texto, doc, grammatical_probs)
     else:
-        print("📝 Detectado como palabra")
+        _debug("📝 Detectado como palabra")
         return clasificar_palabra(texto)
 
-def procesar_archivo_tsv(archivo_path, max_lines=None):
+def _clasificar_entradas(entradas, inicio=0):
+    """
+    Clasifica una lista de palabras/frases del TSV y devuelve sus niveles CEFR.
+    Las frases se analizan con nlp.pipe y predict_batch_raw en lotes.
+    `inicio` es el número de entradas ya procesadas (solo para los mensajes).
+    """
+    # Analizar las frases con spaCy en lotes (nlp.pipe)
+    frases = [texto for texto in entradas if " " in texto]
+    docs = None
+    if HAS_DEPS and nlp and frases:
+        docs = nlp.pipe(frases, batch_size=SPACY_BATCH_SIZE)
+    
+    # Pista gramatical en lotes (una pasada del modelo por lote)
+    puntuaciones = None
+    if classifier is not None and frases:
+        puntuaciones = predecir_por_lotes(frases)
+    
+    niveles = []
+    for numero, palabra_frase in enumerate(entradas, inicio + 1):
+        _debug(f"\n{'='*60}")
+        _debug(f"📊 Procesando {numero}: {palabra_frase}")
+        _debug(f"{'='*60}")
+        
+        doc = None
+        grammatical_probs = None
+        if " " in palabra_frase:
+            if docs is not None:
+                try:
+                    doc = next(docs)
+                except Exception as e:
+                    # El generador de nlp.pipe queda inutilizable: el resto del bloque
+                    # se analiza frase a frase (con su propio manejo de errores)
+                    print(f"⚠️  Error en análisis por lotes con spaCy: {e}")
+                    docs = None
+            if puntuaciones is not None:
+                grammatical_probs = next(puntuaciones)
+        nivel_cefr = clasificar_texto_auto(palabra_frase, doc, grammatical_probs)
+        niveles.append(nivel_cefr)
+        _debug(f"✅ → {nivel_cefr}")
+    
+    return niveles
+
+def _init_worker(model_path_principal, verbose=False):
+    """
+    Inicializador de cada proceso del pool. spaCy y el clasificador ya están
+    cargados a nivel de módulo: con fork (Linux hasta Python 3.13) se heredan
+    del proceso principal, pero con spawn (Windows, macOS) o forkserver (Linux
+    desde Python 3.14) cada proceso vuelve a importar este script y recarga
+    spaCy y el clasificador completo, con su tiempo y memoria por proceso.
+    Si el proceso resolvió otra ruta de modelo que el proceso principal, se
+    carga el modelo de `model_path_principal` para que todos clasifiquen igual.
+    Además se limita torch a un hilo para no saturar los núcleos y se desactiva
+    el análisis detallado para que los procesos no mezclen su salida.
+    """
+    global classifier, model_path, VERBOSE
+    VERBOSE = verbose
+    torch.set_num_threads(1)
+    
+    propio = os.path.abspath(model_path) if model_path else None
+    if model_path_principal and propio != model_path_principal:
+        try:
+            classifier = CEFRClassifier(model_path_principal)
+            model_path = model_path_principal
+        except Exception as e:
+            print(f"⚠️  Error inicializando clasificador en el proceso: {e}")
+
+def _leer_bloques(entrada, max_lines, resto):
     """
-    Procesa un archivo TSV y agrega niveles CEFR a la columna 15 (tags)
+    Lee el TSV línea a línea y genera bloques de hasta TSV_BLOCK_SIZE entradas.
+    Cada elemento de un bloque es una línea ya final (str) o un par
+    (columnas, palabra_frase). Al alcanzar `max_lines` deja la línea actual
+    (sin procesar) en la lista `resto` y termina.
+    """
+    bloque = []
+    en_bloque = 0   # entradas a clasificar en el bloque actual
+    encoladas = 0   # entradas a clasificar en total
+    
+    for linea in entrada:
+        if max_lines and encoladas >= max_lines:
+            resto.append(linea)
+            break
+        
+        linea = linea.rstrip('\n\r')
+        
+        # Procesar solo líneas que no sean comentarios
+        if linea.startswith('#') or not linea.strip():
+            bloque.append(linea)
+            continue
+        
+        # Solo se modifica la columna 15: no hace falta separar el resto
+        columnas = linea.split('\t', 15)
+        
+        # Si no tiene suficientes columnas, agregar columnas vacías hasta llegar a 15
+        if len(columnas) < 15:
+            columnas.extend([''] * (15 - len(columnas)))
+        
+        palabra_frase = columnas[3].strip()  # Columna 4 (índice 3) contiene la palabra
+        if not palabra_frase:
+            bloque.append('\t'.join(columnas))
+            continue
+        
+        bloque.append((columnas, palabra_frase))
+        en_bloque += 1
+        encoladas += 1
+        if en_bloque >= TSV_BLOCK_SIZE:
+            yield bloque
+            bloque = []
+            en_bloque = 0
+    
+    if bloque:
+        yield bloque
+
+def _escribir_bloque(bloque, niveles, salida):
+    """Agrega los niveles a la columna 15 (tags) de las entradas del bloque y lo escribe."""
+    niveles = iter(niveles)
+    for item in bloque:
+        if isinstance(item, str):
+            salida.write(item + '\n')
+            continue
+        
+        columnas, _ = item
+        nivel_cefr = next(niveles)
+        
+        # Agregar a columna 15 (índice 14) - columna de tags
+        tags_existentes = columnas[14].strip()
+        if tags_existentes:
+            columnas[14] = tags_existentes + ' ' + nivel_cefr
+        else:
+            columnas[14] = nivel_cefr
+        
+        salida.write('\t'.join(columnas) + '\n')
+
+def _procesar_bloques(bloques, salida, executor=None, en_vuelo_max=1):
+    """
+    Clasifica y escribe los bloques en orden. Con `executor` los bloques se
+    clasifican en otros procesos, con hasta `en_vuelo_max` bloques pendientes
+    para mantener la memoria acotada. Devuelve el total de entradas procesadas.
+    """
+    procesadas = 0
+    escritas = 0
+    pendientes = deque()
+    
+    def escribir_siguiente():
+        # Solo el proceso principal informa del progreso, un mensaje por bloque
+        nonlocal escritas
+        bloque_listo, n_entradas, futuro = pendientes.popleft()
+        _escribir_bloque(bloque_listo, futuro.result(), salida)
+        escritas += n_entradas
+        print(f"📊 Entradas procesadas: {escritas}")
+    
+    for bloque in bloques:
+        entradas = [item[1] for item in bloque if not isinstance(item, str)]
+        if executor is None:
+            _escribir_bloque(bloque, _clasificar_entradas(entradas, procesadas), salida)
+        else:
+            futuro = executor.submit(_clasificar_entradas, entradas, procesadas)
+            pendientes.append((bloque, len(entradas), futuro))
+            if len(pendientes) >= en_vuelo_max:
+                escribir_siguiente()
+        procesadas += len(entradas)
+    
+    while pendientes:
+        escribir_siguiente()
+    
+    return procesadas
+
+def procesar_archivo_tsv(archivo_path, max_lines=None, workers=None):
+    """
+    Procesa un archivo TSV y agrega niveles CEFR a la columna 15 (tags).
+    El archivo se lee y escribe en streaming, por bloques de TSV_BLOCK_SIZE entradas.
+    Con `workers` > 1 los bloques se clasifican en paralelo (solo en CPU; en GPU
+    se usa un único proceso con predicción por lotes).
     """
     print(f"📁 Procesando archivo: {archivo_path}")
     
@@ -351,75 +779,52 @@ def procesar_archivo_tsv(archivo_path, max_lines=None):
         print(f"❌ Archivo no encontrado: {archivo_path}")
         return
     
+    if workers is None:
+        workers = TSV_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers > 1 and classifier is not None and classifier.device.type == "cuda":
+        print("💡 Clasificador en GPU: se procesa en un solo proceso con lotes")
+        workers = 1
+    
+    base_name = os.path.splitext(archivo_path)[0]
+    archivo_salida = f"{base_name}_CEFR_local.txt"
+    
+    # Se escribe en un temporal del mismo directorio y solo al terminar con éxito
+    # reemplaza a archivo_salida: un error no deja una salida previa truncada.
+    archivo_temporal = f"{archivo_salida}.tmp"
+    
     try:
-        with open(archivo_path, 'r', encoding='utf-8') as f:
-            lineas = f.readlines()
-        
-        lineas_procesadas = []
-        procesadas = 0
-        
-        for i, linea in enumerate(lineas):
-            if max_lines and procesadas >= max_lines:
-                lineas_procesadas.extend(lineas[i:])  # Agregar líneas restantes sin procesar
-                break
-                
-            linea = linea.rstrip('\n\r')
-            
-            # Procesar solo líneas que no sean comentarios
-            if linea.startswith('#') or not linea.strip():
-                lineas_procesadas.append(linea)
-                continue
+        with open(archivo_path, 'r', encoding='utf-8', buffering=1 << 20) as entrada, \
+                open(archivo_temporal, 'w', encoding='utf-8', buffering=1 << 20) as salida:
+            resto = []
+            bloques = _leer_bloques(entrada, max_lines, resto)
             
-            columnas = linea.split('\t')
-            
-            # Verificar que tiene al menos 15 columnas (para columna de tags)
-            if len(columnas) >= 15:
-                palabra_frase = columnas[3].strip()  # Columna 4 (índice 3) contiene la palabra
-                
-                if palabra_frase:
-                    print(f"\n{'='*60}")
-                    print(f"📊 Procesando {procesadas + 1}: {palabra_frase}")
-                    print(f"{'='*60}")
-                    
-                    nivel_cefr = clasificar_texto_auto(palabra_frase)
-                    
-                    # Agregar a columna 15 (índice 14) - columna de tags
-                    tags_existentes = columnas[14].strip()
-                    if tags_existentes:
-                        columnas[14] = tags_existentes + ' ' + nivel_cefr
+            if workers > 1:
+                print(f"⚙️  Procesando en paralelo con {workers} procesos")
+                modelo_principal = os.path.abspath(model_path) if classifier is not None else None
+                # Los procesos que reimportan el script (spawn/forkserver) leen
+                # CEFR_VERBOSE al importarse, antes de ejecutar _init_worker
+                verbose_anterior = os.environ.get("CEFR_VERBOSE")
+                os.environ["CEFR_VERBOSE"] = "0"
+                try:
+                    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(modelo_principal, False)) as executor:
+                        procesadas = _procesar_bloques(bloques, salida, executor, 2 * workers)
+                finally:
+                    if verbose_anterior is None:
+                        os.environ.pop("CEFR_VERBOSE", None)
                     else:
-                        columnas[14] = nivel_cefr
-                    
-                    procesadas += 1
-                    print(f"✅ → {nivel_cefr}")
-                
-                lineas_procesadas.append('\t'.join(columnas))
+                        os.environ["CEFR_VERBOSE"] = verbose_anterior
             else:
-                # Si no tiene suficientes columnas, agregar columnas vacías hasta llegar a 15
-                while len(columnas) < 15:
-                    columnas.append('')
-                
-                palabra_frase = columnas[3].strip()
-                if palabra_frase:
-                    print(f"\n{'='*60}")
-                    print(f"📊 Procesando {procesadas + 1}: {palabra_frase}")
-                    print(f"{'='*60}")
-                    
-                    nivel_cefr = clasificar_texto_auto(palabra_frase)
-                    columnas[14] = nivel_cefr
-                    
-                    procesadas += 1
-                    print(f"✅ → {nivel_cefr}")
-                
-                lineas_procesadas.append('\t'.join(columnas))
-        
-        # Guardar archivo procesado
-        base_name = os.path.splitext(archivo_path)[0]
-        archivo_salida = f"{base_name}_CEFR_local.txt"
+                procesadas = _procesar_bloques(bloques, salida)
+            
+            if resto:
+                # Copiar las líneas restantes sin procesar
+                salida.write(resto[0])
+                shutil.copyfileobj(entrada, salida)
         
-        with open(archivo_salida, 'w', encoding='utf-8') as f:
-            for linea in lineas_procesadas:
-                f.write(linea + '\n')
+        os.replace(archivo_temporal, archivo_salida)
         
         print(f"\n🎉 ¡Procesamiento completado!")
         print(f"📊 Entradas procesadas: {procesadas}")
@@ -427,6 +832,8 @@ def procesar_archivo_tsv(archivo_path, max_lines=None):
         
     except Exception as e:
         print(f"❌ Error procesando archivo: {e}")
+        if os.path.exists(archivo_temporal):
+            os.remove(archivo_temporal)
 
 def main():
     """Función principal con interfaz de línea de comandos"""
@@ -435,9 +842,17 @@ def main():
     parser.add_argument('--text', '-t', help='Frase a clasificar')
     parser.add_argument('--file', '-f', help='Archivo TSV a procesar')
     parser.add_argument('--max-lines', '-m', type=int, help='Máximo de líneas a procesar (para pruebas)')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='No mostrar el análisis detallado de cada palabra/frase')
+    parser.add_argument('--workers', '-j', type=int,
+                        help='Procesos para clasificar el TSV en paralelo (0 = todos los núcleos)')
     
     args = parser.parse_args()
     
+    if args.quiet:
+        global VERBOSE
+        VERBOSE = False
+    
     # Mostrar estado del sistema
     print("🎯 Clasificador CEFR Local")
     print("="*50)
@@ -454,7 +869,7 @@ def main():
         print(f"\n🎯 Resultado final: {args.text} → {resultado}")
         
     elif args.file:
-        procesar_archivo_tsv(args.file, args.max_lines)
+        procesar_archivo_tsv(args.file, args.max_lines, args.workers)
         
     else:
         # Modo interactivo